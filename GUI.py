@@ -7,6 +7,8 @@ from tkinter import messagebox, simpledialog, scrolledtext
 from time import sleep
 from network import send_message
 
+REFRESH_INTERVAL_MS = 500  # how often the views check the blockchain for changes
+
 class BlockchainGUI:
     def __init__(self, root, blockchain, node_identifier, args):
         self.root = root
@@ -122,6 +124,15 @@ class BlockchainGUI:
         status_bar = ttk.Label(root, textvariable=self.status_var, relief=tk.SUNKEN, anchor=tk.W, padding=5)
         status_bar.pack(side=tk.BOTTOM, fill=tk.X)
 
+        # What each view last rendered, so periodic refreshes can skip
+        # unchanged data or only add the new rows.
+        self._pending_shown = None  # Blockchain.version
+        self._success_shown = (None, None, 1)  # (Blockchain.version, chain list, blocks rendered)
+        self._nodes_shown = None  # NodeSet.version
+        self._ledger_shown = (None, None)  # (Blockchain.version, chain list)
+        self._ledger_chain_text = ""
+        self._ledger_block_texts = []  # indent=4 text of each block shown in the ledger
+
         # Initial refreshes
         self.refresh_pending_transactions()
         self.refresh_success_transactions()
@@ -143,8 +154,11 @@ class BlockchainGUI:
         self.refresh_success_transactions()
         self.refresh_nodes()
         self.refresh_ledger()
-        # Schedule the next update after 5000 milliseconds (adjust as needed)
-        self.root.after(5000, self.update_gui)
+        # Each refresh returns at once when its data is unchanged, so polling
+        # often costs next to nothing while idle and shows changes quickly.
+        # (Tk must only be touched from this thread, which rules out having
+        # the network threads push redraws directly.)
+        self.root.after(REFRESH_INTERVAL_MS, self.update_gui)
 
     def log(self, message):
         self.log_text.insert(tk.END, message + "\n")
@@ -183,11 +197,22 @@ class BlockchainGUI:
         submit_btn.grid(row=3, column=0, columnspan=2, pady=10)
 
     def refresh_pending_transactions(self):
-        for item in self.pending_tx_tree.get_children():
-            self.pending_tx_tree.delete(item)
+        version = self.blockchain.version
+        if version == self._pending_shown:
+            return
+        # Rows use the transaction id as their iid, so only transactions that
+        # were added, confirmed or marked mined since the last refresh touch
+        # the widget, and a repeated refresh cannot add a row twice.
+        pending = {}
         for tx in self.blockchain.current_transactions:
             if tx.get("status", "pending") == "pending":
-                self.pending_tx_tree.insert("", tk.END, values=(
+                pending[str(tx.get("id", ""))] = tx
+        for iid in self.pending_tx_tree.get_children():
+            if iid not in pending:
+                self.pending_tx_tree.delete(iid)
+        for iid, tx in pending.items():
+            if not self.pending_tx_tree.exists(iid):
+                self.pending_tx_tree.insert("", tk.END, iid=iid, values=(
                     tx.get("id", ""),
                     tx.get("sender", ""),
                     tx.get("recipient", ""),
@@ -195,11 +220,22 @@ class BlockchainGUI:
                     tx.get("status", "pending"),
                     "Pending"
                 ))
+        self._pending_shown = version
 
     def refresh_success_transactions(self):
-        for item in self.success_tx_tree.get_children():
-            self.success_tx_tree.delete(item)
-        for block in self.blockchain.chain[1:]:
+        version = self.blockchain.version
+        shown_version, shown_chain, shown_blocks = self._success_shown
+        if version == shown_version:
+            return
+        # Blocks never change once added, so while it is the same list only
+        # the blocks added since the last refresh need rows.
+        chain = self.blockchain.chain
+        if chain is not shown_chain or len(chain) < shown_blocks:
+            for item in self.success_tx_tree.get_children():
+                self.success_tx_tree.delete(item)
+            shown_blocks = 1
+        new_blocks = chain[shown_blocks:]
+        for block in new_blocks:
             for tx in block['transactions']:
                 if tx.get("status") == "success":
                     self.success_tx_tree.insert("", tk.END, values=(
@@ -210,25 +246,20 @@ class BlockchainGUI:
                         tx.get("status", ""),
                         block.get("index", "")
                     ))
+        self._success_shown = (version, chain, shown_blocks + len(new_blocks))
 
     def mine_block(self):
-        def task():
-            if self.blockchain.current_leader != self.blockchain.node_address:
-                self.log("You are not the leader, so you cannot mine a block.")
-                return
-
-            if not self.blockchain.current_transactions:
-                self.log("No transactions available to mine. Add a transaction first.")
-                return
+        if self.blockchain.current_leader != self.blockchain.node_address:
+            self.log("You are not the leader, so you cannot mine a block.")
+            return
 
-            self.log("Mining a new block...")
+        if not self.blockchain.current_transactions:
+            self.log("No transactions available to mine. Add a transaction first.")
+            return
 
-            last_block = self.blockchain.last_block
-            last_nonce = last_block['nonce']
-            nonce = self.blockchain.proof_of_work(last_nonce)
-            previous_hash = self.blockchain.hash(last_block)
-            block = self.blockchain.new_block(nonce, previous_hash, auto_broadcast=True)
+        self.log("Mining a new block...")
 
+        def done(block):
             if block:
                 self.log("New Block Forged and committed via consensus.")
                 self.block_info_text.delete("1.0", tk.END)
@@ -236,17 +267,32 @@ class BlockchainGUI:
             else:
                 self.log("Block proposal failed consensus. Please try again.")
 
-            self.refresh_pending_transactions()
-            self.refresh_success_transactions()
-            self.refresh_ledger()
+        def task():
+            last_block = self.blockchain.last_block
+            last_nonce = last_block['nonce']
+            nonce = self.blockchain.proof_of_work(last_nonce)
+            previous_hash = self.blockchain.last_block_hash
+            block = self.blockchain.new_block(nonce, previous_hash, auto_broadcast=True)
+            # Report back on the Tk thread; update_gui picks up the new
+            # block and pool on its next tick.
+            self.root.after(0, done, block)
 
         threading.Thread(target=task, daemon=True).start()
 
     def refresh_nodes(self):
-        for item in self.nodes_tree.get_children():
-            self.nodes_tree.delete(item)
-        for node in self.blockchain.nodes:
-            self.nodes_tree.insert("", tk.END, values=(node,))
+        nodes = self.blockchain.nodes
+        if nodes.version == self._nodes_shown:
+            return
+        # Rows use the node address as their iid, so only nodes that joined
+        # or left since the last refresh touch the widget.
+        current = set(nodes.snapshot())
+        for node in self.nodes_tree.get_children():
+            if node not in current:
+                self.nodes_tree.delete(node)
+        for node in current:
+            if not self.nodes_tree.exists(node):
+                self.nodes_tree.insert("", tk.END, iid=node, values=(node,))
+        self._nodes_shown = nodes.version
 
     def register_node(self):
         address = simpledialog.askstring("Register Node", "Enter node address (host:port):", parent=self.root)
@@ -261,10 +307,9 @@ class BlockchainGUI:
                 if pending_response and pending_response.get("type") == "PENDING":
                     pending_from_peer = pending_response.get("pending", [])
                     for tx in pending_from_peer:
-                        tx_str = json.dumps(tx, sort_keys=True)
-                        local_tx_strs = [json.dumps(local_tx, sort_keys=True) for local_tx in self.blockchain.current_transactions]
-                        if tx_str not in local_tx_strs:
-                            self.blockchain.current_transactions.append(tx)
+                        if tx.get("id") is None or self.blockchain.known_transaction(tx):
+                            continue
+                        self.blockchain.add_transaction(tx)
                     self.refresh_pending_transactions()
                 else:
                     self.log(f"No pending transactions received from {address}.")
@@ -279,14 +324,29 @@ class BlockchainGUI:
             self.log("Our chain was replaced by a longer valid chain.")
         else:
             self.log("Our chain remains authoritative.")
-        self.refresh_pending_transactions()
-        self.refresh_success_transactions()
-        self.refresh_ledger()
 
     def refresh_ledger(self):
+        version = self.blockchain.version
+        shown_version, shown_chain = self._ledger_shown
+        if version == shown_version:
+            return
+        chain = self.blockchain.chain
+        pool = self.blockchain.current_transactions
+        # Dumping the chain with indent=4 is the slow part. Blocks do not
+        # change once added, so keep each block's text and only dump the
+        # blocks added since the last refresh of the same chain list.
+        block_texts = self._ledger_block_texts
+        if chain is not shown_chain or len(chain) < len(block_texts):
+            block_texts = self._ledger_block_texts = []
+        if len(chain) != len(block_texts):
+            for block in chain[len(block_texts):]:
+                # Indented one level, exactly as json.dumps(chain, indent=4) nests it.
+                block_texts.append("    " + json.dumps(block, indent=4).replace("\n", "\n    "))
+            self._ledger_chain_text = "[\n" + ",\n".join(block_texts) + "\n]"
         self.ledger_text.delete("1.0", tk.END)
         ledger_content = (
-            "Confirmed Blockchain:\n" + json.dumps(self.blockchain.chain, indent=4) +
-            "\n\nPending Transactions:\n" + json.dumps(self.blockchain.current_transactions, indent=4)
+            "Confirmed Blockchain:\n" + self._ledger_chain_text +
+            "\n\nPending Transactions:\n" + json.dumps(pool, indent=4)
         )
         self.ledger_text.insert(tk.END, ledger_content)
+        self._ledger_shown = (version, chain)
@@ -1,24 +1,132 @@
 import hashlib
+import itertools
 import json
-from time import time
+import multiprocessing
+import os
+from time import monotonic, time
 import uuid
 import threading
 import random
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 
 debug = False
 
-def canonical_transaction(tx):
-    """Return a canonical JSON representation of a transaction, ignoring the 'status' field."""
-    return json.dumps({k: v for k, v in tx.items() if k != 'status'}, sort_keys=True)
+SEEN_MAX = 100000  # entries kept in Blockchain.seen_blocks / seen_transactions
+_BLOCK_HASH_CACHE_SIZE = 4096
+_block_hash_cache = OrderedDict()  # id(block) -> (block, hex hash)
+_block_hash_lock = threading.Lock()
+
+def _remember(seen, key):
+    """Record key as most recently seen in an OrderedDict capped at SEEN_MAX."""
+    seen[key] = None
+    seen.move_to_end(key)
+    if len(seen) > SEEN_MAX:
+        seen.popitem(last=False)
+
+def proof_target(difficulty):
+    """Return the bound a proof hash must stay under: `difficulty` leading zero hex digits.
+
+    Only meaningful for difficulty >= 0; above 64 the bound bottoms out at 1.
+    """
+    return 1 << max(0, 256 - 4 * difficulty)
+
+# Below this difficulty a search takes milliseconds and a single process wins.
+POW_PARALLEL_DIFFICULTY = 6
+POW_CHUNK = 1 << 16  # nonces per task handed to a mining process
+_pow_pool = None
+_pow_workers = os.cpu_count() or 1
+
+def _search_nonces(last_nonce, suffix, target, start, stop=None):
+    """Return the first nonce in [start, stop) whose guess hash is under target, or None.
+
+    Module-level so it can run in a mining process.
+    """
+    copy_prefix = hashlib.sha256(str(last_nonce).encode()).copy
+    nonces = itertools.count(start) if stop is None else range(start, stop)
+    for nonce in nonces:
+        guess = copy_prefix()
+        guess.update(b'%d' % nonce)
+        guess.update(suffix)
+        if guess.digest() < target:
+            return nonce
+    return None
+
+def _parallel_search(last_nonce, suffix, target):
+    """Search successive nonce chunks on every core and return the first hit."""
+    global _pow_pool
+    if _pow_pool is None:
+        # spawn, not fork: the node process is full of threads holding locks.
+        _pow_pool = ProcessPoolExecutor(max_workers=_pow_workers,
+                                        mp_context=multiprocessing.get_context("spawn"))
+    start = 0
+    running = set()
+    while True:
+        while len(running) < 2 * _pow_workers:
+            running.add(_pow_pool.submit(_search_nonces, last_nonce, suffix, target, start, start + POW_CHUNK))
+            start += POW_CHUNK
+        done, running = wait(running, return_when=FIRST_COMPLETED)
+        found = [f.result() for f in done if f.result() is not None]
+        if found:
+            for f in running:
+                f.cancel()
+            return min(found)
+
+class NodeSet(set):
+    """The set of peer addresses, counting changes made through add/discard.
+
+    version lets replies and snapshots built from the set be cached until it
+    changes; only add and discard should be used to mutate it.
+    """
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.version = 0
+        self._snapshot = (None, ())
+
+    def add(self, node):
+        if node not in self:
+            super().add(node)
+            self.version += 1
+
+    def discard(self, node):
+        if node in self:
+            super().discard(node)
+            self.version += 1
+
+    def snapshot(self):
+        """Return the current peers as a tuple, reused until the set changes."""
+        version, nodes = self._snapshot
+        if version != self.version:
+            version = self.version
+            nodes = tuple(self)
+            self._snapshot = (version, nodes)
+        return nodes
 
 class Blockchain:
     def __init__(self, node_id):
         self.node_id = node_id
         self.chain = []
         self.current_transactions = []
-        self.nodes = set()
-        self.seen_transactions = set()
-        self.seen_blocks = set()
+        self.current_tx_hashes = {}  # transaction id -> pending transaction
+        # Every transaction added to the pending pool gets an increasing
+        # sequence number so peers can pull only what they have not seen yet.
+        self.pending_seq = 0
+        self.pending_seq_by_id = {}
+        self.last_pending_seen = {}  # peer address -> last pending_seq received
+        self.last_quiescent_epoch = None  # fingerprint of peer chain heads at the last full sync
+        self.nodes = NodeSet()
+        # Recently seen ids/hashes, oldest first; capped at SEEN_MAX entries.
+        self.seen_transactions = OrderedDict()
+        self.seen_blocks = OrderedDict()
+        self.confirmed_ids = set()  # ids of every transaction in self.chain
+        # Bumped after every change to the chain or the pending pool, like
+        # NodeSet.version; cached replies and the GUI views compare against it.
+        self.version = 0
+        self._cleaned_version = None  # version at the last cleanup_pending_transactions
+        self._last_block_hash_cache = (None, None)  # (block, hash) of the last hashed tip
+        self.reply_cache = {}  # pre-encoded replies to chain/pool/peer queries, see network._cached_frame
+        self.sync_needed = threading.Event()  # set when a peer's block shows we are behind
         self.current_leader = None  # Leader election attribute
         
         self.difficulty = 4
@@ -26,10 +134,10 @@ class Blockchain:
 
         # Set the election start time (when the first node starts)
         self.election_start_time = time()
+        self.election_start_monotonic = monotonic()  # same instant on the local monotonic clock
 
         genesis_block = self.create_genesis_block()
-        self.chain.append(genesis_block)
-        self.seen_blocks.add(self.hash(genesis_block))
+        self.add_block(genesis_block)
 
         self.node_address = None  # Node address for leader election
 
@@ -54,9 +162,9 @@ class Blockchain:
     def elect_leader(self):
         if debug:
             print("Election started at node " + str(self.node_address))
-        from network import send_message
+        from network import query_peers
         self.resolve_conflicts()
-        Qn = self.hash(self.last_block)
+        Qn = self.last_block_hash
         
         candidate_addresses = list(self.nodes)
         if hasattr(self, 'node_address') and self.node_address is not None:
@@ -65,11 +173,12 @@ class Blockchain:
             candidate_addresses.append(str(self.node_id))
         
         reachable_candidates = []
+        pings = query_peers([c for c in candidate_addresses if c != self.node_address], {"type": "PING"})
         for candidate in candidate_addresses:
             if candidate == self.node_address:
                 reachable_candidates.append(candidate)
             else:
-                response = send_message(candidate, {"type": "PING"}, expect_response=True)
+                response = pings[candidate]
                 if response and response.get("status") == "OK":
                     reachable_candidates.append(candidate)
                 else:
@@ -96,16 +205,16 @@ class Blockchain:
 
     def valid_chain(self, chain):
         last_block = chain[0]
-        current_index = 1
-        while current_index < len(chain):
-            block = chain[current_index]
-            if block['previous_hash'] != self.hash(last_block):
+        for block in itertools.islice(chain, 1, None):
+            # Hash each block once and use it for both checks; the cheap link
+            # check runs before the proof-of-work hash.
+            last_hash = self.hash(last_block)
+            if block['previous_hash'] != last_hash:
                 return False
-            if not self.valid_proof(last_block['nonce'], block['nonce'], self.hash(last_block),
+            if not self.valid_proof(last_block['nonce'], block['nonce'], last_hash,
                                     block.get("difficulty", self.difficulty)):
                 return False
             last_block = block
-            current_index += 1
         return True
 
     def cumulative_work(self, chain=None):
@@ -115,32 +224,54 @@ class Blockchain:
         if(debug): print(f"Cumulative work: {sums}")
         return sums
 
-    def resolve_conflicts(self):
-        from network import send_message
-        neighbours = list(self.nodes)
+    def resolve_conflicts(self, heads=None):
+        from network import send_message, query_peers
+        local_chain = self.chain
+        current_work = self.cumulative_work(local_chain)
         new_chain = None
-        current_work = self.cumulative_work()
-
-        for node in neighbours:
-            response = send_message(node, {"type": "GET_CHAIN"}, expect_response=True)
-            if response and response.get("type") == "CHAIN":
-                chain = response.get("chain")
-                if chain and self.valid_chain(chain):
-                    chain_work = self.cumulative_work(chain)
-                    if chain_work > current_work:
-                        current_work = chain_work
-                        new_chain = chain
+        new_blocks = None
+
+        # Ask every peer for its head first (unless the caller just did) and
+        # only download from peers that claim more work than we have, best
+        # claim first.
+        if heads is None:
+            heads = query_peers(self.nodes, {"type": "GET_HEAD"})
+        candidates = sorted(
+            ((head.get("work", 0), node) for node, head in heads.items()
+             if head and head.get("type") == "HEAD" and head.get("work", 0) > current_work),
+            reverse=True
+        )
+        for _, node in candidates:
+            chain = blocks = None
+            # Usually the peer is simply ahead of us: fetch only the blocks past our tip.
+            response = send_message(node, {"type": "GET_CHAIN_SINCE", "index": local_chain[-1]['index']},
+                                    expect_response=True)
+            if response and response.get("type") == "CHAIN_DELTA":
+                delta = response.get("blocks")
+                if delta and self.valid_chain([local_chain[-1]] + delta):
+                    chain = local_chain + delta
+                    blocks = delta
+            if chain is None:
+                # The peer forked below our tip; fall back to its full chain.
+                response = send_message(node, {"type": "GET_CHAIN"}, expect_response=True)
+                if response and response.get("type") == "CHAIN":
+                    full_chain = response.get("chain")
+                    if full_chain and self.valid_chain(full_chain):
+                        chain = blocks = full_chain
+            if chain and self.cumulative_work(chain) > current_work:
+                new_chain = chain
+                new_blocks = blocks
+                break
 
         if new_chain:
             self.chain = new_chain
-            confirmed = set()
-            for block in new_chain:
-                for tx in block.get("transactions", []):
-                    confirmed.add(canonical_transaction(tx))
-            self.current_transactions = [
-                tx for tx in self.current_transactions 
-                if canonical_transaction(tx) not in confirmed
-            ]
+            if new_blocks is new_chain:
+                self.confirmed_ids = set()
+            self.confirmed_ids.update(tx.get("id") for block in new_blocks for tx in block.get("transactions", []))
+            for block in new_blocks:
+                _remember(self.seen_blocks, self.hash(block))
+            self.commit_transactions(tx for block in new_blocks for tx in block.get("transactions", []))
+            self.version += 1
             if debug:
                 print("Chain replaced via resolve_conflicts with higher cumulative work.")
             return True
@@ -192,13 +323,14 @@ class Blockchain:
         # Mark transactions as successful.
         for tx in self.current_transactions:
             tx['status'] = 'success'
+        self.version += 1
 
         block = {
             'index': len(self.chain) + 1,
             'timestamp': time(),
             'transactions': self.current_transactions.copy(),
             'nonce': nonce,
-            'previous_hash': previous_hash or self.hash(self.chain[-1]),
+            'previous_hash': previous_hash or self.last_block_hash,
             'difficulty': self.difficulty
         }
 
@@ -206,11 +338,7 @@ class Blockchain:
             committed_block = self.propose_block(block)
             return committed_block
         else:
-            self.chain.append(block)
-            self.current_transactions = []
-            block_hash = self.hash(block)
-            if block_hash not in self.seen_blocks:
-                self.seen_blocks.add(block_hash)
+            self.add_block(block)
             self.adjust_difficulty()
             return block
 
@@ -226,11 +354,7 @@ class Blockchain:
         if approvals >= quorum_threshold:
             for node in list(self.nodes):
                 send_message(node, {"type": "BLOCK_COMMIT", "block": block})
-            self.chain.append(block)
-            self.current_transactions = []
-            block_hash = self.hash(block)
-            if block_hash not in self.seen_blocks:
-                self.seen_blocks.add(block_hash)
+            self.add_block(block)
             if debug:
                 print("Block committed with consensus. Approvals:", approvals)
             self.adjust_difficulty()
@@ -270,64 +394,165 @@ class Blockchain:
                 'status': 'pending'
             }
 
-        # If the transaction has already been processed (seen), skip adding it.
-        if transaction.get("id") in self.seen_transactions:
+        # Skip transactions that are already pending or were recently committed.
+        if self.known_transaction(transaction):
             if debug:
                 print("Transaction already processed (seen).")
             return self.last_block['index'] + 1
 
-        # Check if a transaction with the same ID is already pending.
-        if any(tx.get("id") == transaction.get("id") for tx in self.current_transactions):
-            return self.last_block['index'] + 1
-
-        self.current_transactions.append(transaction)
+        self.add_transaction(transaction)
 
         if auto_broadcast:
             from network import broadcast_message
-            broadcast_message(self, {"type": "NEW_TRANSACTION", "transaction": transaction})
+            # Gossip in the background; the caller (usually the GUI) need not wait.
+            broadcast_message(self, {"type": "NEW_TRANSACTION", "transaction": transaction}, block=False)
 
         return self.last_block['index'] + 1
 
 
 
 
+    def add_transaction(self, tx):
+        """Append a transaction to the pending pool and stamp it with the next sequence number."""
+        self.pending_seq += 1
+        self.pending_seq_by_id[tx.get("id")] = self.pending_seq
+        self.current_transactions.append(tx)
+        self.current_tx_hashes[tx.get("id")] = tx
+        self.version += 1
+
+    def known_transaction(self, tx):
+        """Return True if tx is already pending or was committed in a recent block."""
+        tx_id = tx.get("id")
+        return tx_id in self.seen_transactions or tx_id in self.current_tx_hashes
+
+    def commit_transactions(self, transactions):
+        """Mark transactions as confirmed and drop them from the pending pool."""
+        transactions = list(transactions)
+        for tx in transactions:
+            if tx.get("id") is not None:
+                _remember(self.seen_transactions, tx["id"])
+        self.remove_transactions(transactions)
+
+    def remove_transactions(self, transactions):
+        """Drop any of the given (e.g. newly confirmed) transactions from the pending pool."""
+        keys = {tx.get("id") for tx in transactions} & self.current_tx_hashes.keys()
+        if not keys:
+            return
+        # The index hands back the pool's own objects, so the pool can be
+        # filtered by identity without keying it again.
+        confirmed = {id(self.current_tx_hashes.pop(key)) for key in keys}
+        for key in keys:
+            self.pending_seq_by_id.pop(key, None)
+        self.current_transactions = [tx for tx in self.current_transactions if id(tx) not in confirmed]
+        self.version += 1
+
+    def pending_since(self, seq):
+        """Return pending transactions added after sequence number seq."""
+        return [tx for tx in self.current_transactions
+                if self.pending_seq_by_id.get(tx.get("id"), 0) > seq]
+
+    def add_block(self, block):
+        """Append an accepted block to the chain, mark it seen and drop its transactions from the pool."""
+        self.chain.append(block)
+        self.confirmed_ids.update(tx.get("id") for tx in block.get("transactions", []))
+        self.commit_transactions(block.get("transactions", []))
+        block_hash = self.hash(block)
+        _remember(self.seen_blocks, block_hash)
+        self._last_block_hash_cache = (block, block_hash)
+        self.version += 1
+
     def hash(self, block):
+        """Return the hex SHA-256 of a block, memoized per block object.
+
+        Blocks are not modified once built, so the cache is keyed by identity
+        and holds the block to keep its id() live.
+        """
+        key = id(block)
+        with _block_hash_lock:
+            entry = _block_hash_cache.get(key)
+            if entry is not None and entry[0] is block:
+                _block_hash_cache.move_to_end(key)
+                return entry[1]
         block_string = json.dumps(block, sort_keys=True).encode()
-        return hashlib.sha256(block_string).hexdigest()
+        block_hash = hashlib.sha256(block_string).hexdigest()
+        with _block_hash_lock:
+            _block_hash_cache[key] = (block, block_hash)
+            if len(_block_hash_cache) > _BLOCK_HASH_CACHE_SIZE:
+                _block_hash_cache.popitem(last=False)
+        return block_hash
 
     def hash_chain(self, chain=None):
         if chain is None:
             chain = self.chain
-        canonical = json.dumps(chain, sort_keys=True)
-        return hashlib.sha256(canonical.encode()).hexdigest()
+        # Feed the digest block by block rather than building one string for
+        # the whole chain; the bytes hashed are identical to
+        # json.dumps(chain, sort_keys=True).
+        digest = hashlib.sha256(b"[")
+        for i, block in enumerate(chain):
+            if i:
+                digest.update(b", ")
+            digest.update(json.dumps(block, sort_keys=True).encode())
+        digest.update(b"]")
+        return digest.hexdigest()
 
     @property
     def last_block(self):
         return self.chain[-1]
 
+    @property
+    def last_block_hash(self):
+        """Hash of the current tip, recomputed only when the tip block changes."""
+        block = self.chain[-1]
+        cached_block, cached_hash = self._last_block_hash_cache
+        if cached_block is not block:
+            cached_hash = self.hash(block)
+            self._last_block_hash_cache = (block, cached_hash)
+        return cached_hash
+
     def valid_proof(self, last_nonce, nonce, last_hash, difficulty):
+        if difficulty < 0:
+            return False  # no hash has a negative number of leading zeros
         guess = f'{last_nonce}{nonce}{last_hash}'.encode()
-        guess_hash = hashlib.sha256(guess).hexdigest()
-        return guess_hash[:difficulty] == "0" * difficulty
+        digest = hashlib.sha256(guess).digest()
+        return int.from_bytes(digest, "big") < proof_target(difficulty)
 
     def proof_of_work(self, last_nonce):
-        nonce = 0
-        while True:
-            guess = f'{last_nonce}{nonce}{self.hash(self.last_block)}'.encode()
-            guess_hash = hashlib.sha256(guess).hexdigest()
-            if guess_hash[:self.difficulty] == "0" * self.difficulty:
-                return nonce
-            nonce += 1
+        # Only the nonce changes between guesses: hash the last nonce once and
+        # copy that state, and compare raw digests instead of hex strings.
+        suffix = self.last_block_hash.encode()
+        target = proof_target(self.difficulty)
+        if target >> 256:
+            return 0  # difficulty 0: every guess is valid
+        # Equal-length big-endian bytes compare like the integers they encode.
+        target = target.to_bytes(32, "big")
+        if self.difficulty >= POW_PARALLEL_DIFFICULTY and _pow_workers > 1:
+            return _parallel_search(last_nonce, suffix, target)
+        return _search_nonces(last_nonce, suffix, target, 0)
 
     def cleanup_pending_transactions(self):
         """
         Remove transactions from the pending list if their id is found in any block of the chain.
         """
-        # Gather all transaction ids from the confirmed blocks in the ledger.
-        confirmed_ids = {tx.get("id") for block in self.chain for tx in block.get("transactions", [])}
+        # Nothing to do if neither the chain nor the pool changed since the
+        # last call; add_block and resolve_conflicts keep confirmed_ids current.
+        version = self.version
+        if version == self._cleaned_version:
+            return
+        self._cleaned_version = version
+
         original_count = len(self.current_transactions)
         # Keep only transactions that have not been confirmed.
-        self.current_transactions = [tx for tx in self.current_transactions if tx.get("id") not in confirmed_ids]
+        confirmed_ids = self.confirmed_ids
+        remaining = [tx for tx in self.current_transactions if tx.get("id") not in confirmed_ids]
+        if len(remaining) == original_count:
+            # Nothing was dropped: skip re-keying every pending transaction.
+            return
+        self.current_transactions = remaining
+        pending_ids = {tx.get("id") for tx in self.current_transactions}
+        self.current_tx_hashes = {tx.get("id"): tx for tx in self.current_transactions}
+        self.pending_seq_by_id = {tx_id: seq for tx_id, seq in self.pending_seq_by_id.items() if tx_id in pending_ids}
+        self.version += 1
+        self._cleaned_version = self.version
         if debug:
             removed = original_count - len(self.current_transactions)
             if removed > 0:
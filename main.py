@@ -1,44 +1,76 @@
-import argparse
-import json
+import random
+import sys
 import threading
 from time import sleep
-import tkinter as tk
+from types import SimpleNamespace
 import logging
 
 from blockchain import Blockchain
-from network import run_server, send_message, broadcast_election
-from GUI import BlockchainGUI
+from network import run_server, send_message, broadcast_election, query_peers
+
+PENDING_FANOUT = 3  # peers asked for new pending transactions per sync cycle
+SYNC_INTERVAL = 30  # seconds between sync cycles when no block gap is reported
+
+# Set on shutdown so the election scheduler exits promptly.
+stop_event = threading.Event()
 
 def periodic_sync(blockchain):
-    import time
     while True:
-        blockchain.resolve_conflicts()
-        blockchain.discover_peers()
+        # Sleep until a block handler reports that we fell behind, or
+        # SYNC_INTERVAL passes as a fallback for changes nobody announced.
+        woken = blockchain.sync_needed.wait(timeout=SYNC_INTERVAL)
+        blockchain.sync_needed.clear()
+
+        # Probe every peer's chain head first; the full chain comparison and
+        # peer discovery only run when some head differs from the last cycle.
+        heads = query_peers(blockchain.nodes, {"type": "GET_HEAD"})
+        epoch = hash(frozenset(
+            (node, (head.get("length"), head.get("hash"), head.get("nodes")) if head else None)
+            for node, head in heads.items()
+        ))
+        if woken or epoch != blockchain.last_quiescent_epoch:
+            blockchain.resolve_conflicts(heads)
+            blockchain.discover_peers()
+            # Only treat these heads as settled once no peer claims more work
+            # than we now have; a failed download is retried next cycle.
+            work = blockchain.cumulative_work()
+            if not any(head and head.get("type") == "HEAD" and head.get("work", 0) > work
+                       for head in heads.values()):
+                blockchain.last_quiescent_epoch = epoch
         
         from network import send_message
-        for node in list(blockchain.nodes):
-            pending_response = send_message(node, {"type": "GET_PENDING"}, expect_response=True)
+        # Gossip-style pull: ask a few random peers for what they added since
+        # we last heard from them instead of every peer for its whole pool.
+        peers = list(blockchain.nodes)
+        for node in random.sample(peers, k=min(PENDING_FANOUT, len(peers))):
+            since = blockchain.last_pending_seen.get(node, 0)
+            pending_response = send_message(node, {"type": "GET_PENDING", "since": since}, expect_response=True)
             if pending_response and pending_response.get("type") == "PENDING":
+                seq = pending_response.get("seq", 0)
+                # A sequence number going backwards means the peer restarted;
+                # pull its full pool next time.
+                blockchain.last_pending_seen[node] = seq if seq >= since else 0
                 pending_from_peer = pending_response.get("pending", [])
                 for tx in pending_from_peer:
-                    tx_str = json.dumps(tx, sort_keys=True)
-                    local_tx_strs = {json.dumps(local_tx, sort_keys=True) for local_tx in blockchain.current_transactions}
-                    if tx_str not in local_tx_strs:
-                        blockchain.current_transactions.append(tx)
+                    # Transactions without an id cannot be deduplicated; drop them.
+                    if tx.get("id") is None or blockchain.known_transaction(tx):
+                        continue
+                    blockchain.add_transaction(tx)
 
         blockchain.cleanup_pending_transactions()
-        
-        time.sleep(5)
 
 def election_scheduler(blockchain):
     import time
     election_interval = 30  # seconds
     while True:
-        current_time = time.time()
-        elapsed = current_time - blockchain.election_start_time
-        next_election = blockchain.election_start_time + ((int(elapsed / election_interval) + 1) * election_interval)
+        # Monotonic time cannot jump under NTP adjustments, so the schedule
+        # never spins or skips an election when the wall clock moves.
+        current_time = time.monotonic()
+        elapsed = current_time - blockchain.election_start_monotonic
+        next_election = blockchain.election_start_monotonic + ((int(elapsed / election_interval) + 1) * election_interval)
         time_to_next_election = next_election - current_time
-        time.sleep(time_to_next_election)
+        if stop_event.wait(time_to_next_election):
+            return
         from network import broadcast_election
         broadcast_election(blockchain)
 
@@ -46,15 +78,56 @@ def run_tests():
     print("Running tests...")
     print("Tests complete.")
 
+USAGE = """usage: main.py [-h] [--host HOST] [-p PORT] [--peers PEERS] [--test]
+
+Advanced P2P Blockchain Node with Synchronous Consensus (pure Python)
+
+options:
+  -h, --help            show this help message and exit
+  --host HOST           Host address of this node (use "0.0.0.0" to listen on all interfaces)
+  -p PORT, --port PORT  Port to listen on
+  --peers PEERS         Comma-separated list of peer addresses in host:port format
+  --test                Run test suite instead of launching the GUI."""
+
+def parse_args(argv):
+    """Parse the handful of fixed flags without paying for argparse at startup."""
+    args = SimpleNamespace(host="127.0.0.1", port=5000, peers="", test=False)
+    remaining = iter(argv)
+    for arg in remaining:
+        if arg.startswith("--"):
+            flag, sep, value = arg.partition("=")
+        elif arg.startswith("-p") and len(arg) > 2:
+            # Attached short form: -p5001 (or -p=5001).
+            flag, sep, value = "-p", "=", arg[2:].removeprefix("=")
+        else:
+            flag, sep, value = arg, "", ""
+        if flag in ("-h", "--help"):
+            print(USAGE)
+            sys.exit(0)
+        if flag == "--test":
+            if sep:
+                sys.exit(f"{USAGE}\nmain.py: error: argument --test: ignored explicit argument '{value}'")
+            args.test = True
+            continue
+        if flag not in ("--host", "-p", "--port", "--peers"):
+            sys.exit(f"{USAGE}\nmain.py: error: unrecognized argument: {arg}")
+        if not sep:
+            value = next(remaining, None)
+            if value is None:
+                sys.exit(f"{USAGE}\nmain.py: error: argument {flag}: expected one argument")
+        if flag == "--host":
+            args.host = value
+        elif flag == "--peers":
+            args.peers = value
+        else:
+            try:
+                args.port = int(value)
+            except ValueError:
+                sys.exit(f"{USAGE}\nmain.py: error: argument {flag}: invalid int value: '{value}'")
+    return args
+
 def main():
-    parser = argparse.ArgumentParser(
-        description="Advanced P2P Blockchain Node with Synchronous Consensus (pure Python)"
-    )
-    parser.add_argument('--host', default="127.0.0.1", help='Host address of this node (use "0.0.0.0" to listen on all interfaces)')
-    parser.add_argument('-p', '--port', default=5000, type=int, help='Port to listen on')
-    parser.add_argument('--peers', default="", help='Comma-separated list of peer addresses in host:port format')
-    parser.add_argument('--test', action='store_true', help='Run test suite instead of launching the GUI.')
-    args = parser.parse_args()
+    args = parse_args(sys.argv[1:])
 
     if args.test:
         run_tests()
@@ -76,6 +149,8 @@ def main():
                         logging.info(f"Registered with peer {peer}.")
                         peer_start_time = response.get("election_start_time")
                         if peer_start_time and peer_start_time < blockchain.election_start_time:
+                            # Shift the local monotonic anchor by the same amount.
+                            blockchain.election_start_monotonic -= blockchain.election_start_time - peer_start_time
                             blockchain.election_start_time = peer_start_time
                     else:
                         logging.error(f"Error registering with peer {peer}: {response.get('message') if response else 'No response'}")
@@ -88,6 +163,7 @@ def main():
         from network import broadcast_election
         broadcast_election(blockchain)
 
+    stop_event.clear()
     server_thread = threading.Thread(
         target=run_server,
         args=(args.host, args.port, blockchain, node_identifier),
@@ -101,10 +177,16 @@ def main():
     election_thread = threading.Thread(target=election_scheduler, args=(blockchain,), daemon=True)
     election_thread.start()
 
+    # tkinter is the slowest import by far; load it only once the node is
+    # already serving peers.
+    import tkinter as tk
+    from GUI import BlockchainGUI
+
     sleep(1)
     root = tk.Tk()
     app = BlockchainGUI(root, blockchain, node_identifier, args)
     root.mainloop()
+    stop_event.set()
 
 if __name__ == '__main__':
     logging.basicConfig(level=logging.INFO)
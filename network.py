@@ -1,192 +1,575 @@
 import json
+import queue
+import selectors
 import socket
+import struct
 import threading
 import logging
-from blockchain import canonical_transaction
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from time import monotonic
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib encoder.
+    orjson = None
 
 debug = False
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
 
+POOL_SIZE = 4  # idle connections kept per peer
+MAX_POOLED_PEERS = 64  # peers with idle connections kept, least recently used evicted first
+BROADCAST_WAIT = 2  # seconds a broadcast waits for its sends before returning
+POOL_IDLE_TIMEOUT = 60  # seconds an idle pooled connection is trusted for reuse
+MAX_BACKOFF = 60  # longest time, in seconds, broadcasts skip a failing peer
+_HEADER = struct.Struct(">I")
+# Largest frame body accepted from a peer; bigger length prefixes are treated
+# as a protocol error instead of being buffered.
+MAX_FRAME_BYTES = 16 * 1024 * 1024
+SOCKET_BUFFER_BYTES = 1 << 20  # SO_SNDBUF / SO_RCVBUF requested for peer sockets
+_pool = OrderedDict()  # peer address -> queue.Queue of (socket, idle since)
+_pool_lock = threading.Lock()
+_backoff = {}  # peer address -> (consecutive failures, monotonic time of next attempt)
+_request_pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="peer-request")
+_handler_pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="peer-handler")
+# Messages a server will queue for _handler_pool before answering new ones
+# with BUSY_FRAME instead of letting the backlog grow without bound.
+MAX_QUEUED_MESSAGES = 256
+
+def dumps(message):
+    """Encode a message as JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(message)
+    return json.dumps(message).encode("utf-8")
+
+def loads(data):
+    """Decode JSON from bytes or a bytearray."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(bytes(data).decode("utf-8"))
+
+def encode_frame(message):
+    """Serialize a message as a 4-byte big-endian length prefix followed by JSON."""
+    body = dumps(message)
+    return _HEADER.pack(len(body)) + body
+
+BUSY_FRAME = encode_frame({"status": "Error", "message": "Server busy."})
+
+def _recv_exact(sock, size):
+    buf = bytearray(size)
+    view = memoryview(buf)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:])
+        if n == 0:
+            return None
+        received += n
+    return buf
+
+def read_frame(sock):
+    """Read one length-prefixed message from a socket, or None on EOF."""
+    header = _recv_exact(sock, _HEADER.size)
+    if header is None:
+        return None
+    (length,) = _HEADER.unpack(header)
+    if length > MAX_FRAME_BYTES:
+        raise ValueError(f"frame of {length} bytes exceeds MAX_FRAME_BYTES")
+    body = _recv_exact(sock, length)
+    if body is None:
+        return None
+    return loads(body)
+
+def _tune_socket(sock):
+    """Apply the options every peer connection uses."""
+    # Replies are small and sent in one go; don't let Nagle hold them back.
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    _set_buffers(sock)
+
+def _set_buffers(sock):
+    # Larger buffers let a whole CHAIN reply sit in the kernel instead of
+    # trickling out in default-sized windows.
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER_BYTES)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_BYTES)
+
+def _connect(peer_address):
+    host, port_str = peer_address.split(":")
+    sock = socket.create_connection((host, int(port_str)), timeout=5)
+    _tune_socket(sock)
+    return sock
+
+def _close_idle(pool):
+    while True:
+        try:
+            pool.get_nowait()[0].close()
+        except queue.Empty:
+            return
+
+def _checkout(pool):
+    """Return a pooled socket idle for less than POOL_IDLE_TIMEOUT, or None."""
+    while True:
+        try:
+            sock, idle_since = pool.get_nowait()
+        except queue.Empty:
+            return None
+        if monotonic() - idle_since < POOL_IDLE_TIMEOUT:
+            return sock
+        # Long-idle connections are likely dropped by a NAT or the peer;
+        # close them here rather than paying for a failed send and retry.
+        sock.close()
+
+def _peer_pool(peer_address):
+    """Return the idle-connection queue for a peer, evicting the least recently used peers."""
+    evicted = []
+    with _pool_lock:
+        pool = _pool.get(peer_address)
+        if pool is None:
+            pool = _pool[peer_address] = queue.Queue(maxsize=POOL_SIZE)
+        _pool.move_to_end(peer_address)
+        while len(_pool) > MAX_POOLED_PEERS:
+            evicted.append(_pool.popitem(last=False)[1])
+    for old in evicted:
+        _close_idle(old)
+    return pool
+
+def _drop_peer_pool(peer_address):
+    """Close every idle connection to a peer that just failed to answer."""
+    with _pool_lock:
+        pool = _pool.pop(peer_address, None)
+    if pool is not None:
+        _close_idle(pool)
+
+def _exchange(sock, frame):
+    sock.sendall(frame)
+    # The reply is always read, even if the caller does not want it, so the
+    # connection is left clean for the next message.
+    response = read_frame(sock)
+    if response is None:
+        raise ConnectionError("connection closed by peer")
+    return response
+
 def send_message(peer_address, message, expect_response=False):
+    return send_raw(peer_address, encode_frame(message), expect_response)
+
+def send_raw(peer_address, frame, expect_response=False):
+    """Send an already encoded frame (see encode_frame) to a peer."""
+    pool = _peer_pool(peer_address)
+    sock = _checkout(pool)
     try:
-        host, port_str = peer_address.split(":")
-        port = int(port_str)
-        with socket.create_connection((host, port), timeout=5) as sock:
-            sock.settimeout(5)
-            sock.sendall((json.dumps(message) + "\n").encode("utf-8"))
-            if expect_response:
-                file = sock.makefile()
-                response_line = file.readline()
-                if response_line:
-                    return json.loads(response_line)
+        if sock is None:
+            sock = _connect(peer_address)
+            response = _exchange(sock, frame)
+        else:
+            try:
+                response = _exchange(sock, frame)
+            except ConnectionError:
+                # A pooled connection may have been closed by the peer while
+                # idle; retry once on a fresh one. Timeouts are not retried:
+                # a slow peer may still act on the first copy.
+                sock.close()
+                sock = None
+                sock = _connect(peer_address)
+                response = _exchange(sock, frame)
     except Exception as e:
+        if sock is not None:
+            sock.close()
+        # Other idle connections to this peer are most likely dead as well.
+        _drop_peer_pool(peer_address)
+        failures = _backoff.get(peer_address, (0, 0))[0] + 1
+        _backoff[peer_address] = (failures, monotonic() + min(MAX_BACKOFF, 2 ** failures))
         logging.error(f"Error sending message to {peer_address}: {e}")
-    return None
-
-def handle_client_connection(conn, addr, blockchain, node_identifier):
+        return None
+    _backoff.pop(peer_address, None)
     try:
-        file = conn.makefile(mode="rwb")
-        line = file.readline()
-        if not line:
-            return
-        message = json.loads(line.decode("utf-8"))
-        msg_type = message.get("type")
-        response = {}
+        pool.put_nowait((sock, monotonic()))
+    except queue.Full:
+        sock.close()
+    return response if expect_response else None
 
-        if msg_type == "PING":
-            response = {"status": "OK", "message": "Alive"}
+def _handle_ping(message, blockchain):
+    return {"status": "OK", "message": "Alive"}
 
-        elif msg_type == "GET_CHAIN":
-            response = {"type": "CHAIN", "chain": blockchain.chain}
+def _cached_frame(blockchain, name, version, build):
+    """Return a pre-encoded reply, re-encoding only when version changes.
 
-        elif msg_type == "REGISTER_NODE":
-            new_node = message.get("node")
-            if new_node:
-                try:
-                    blockchain.register_node(new_node)
-                    response = {
-                        "status": "OK",
-                        "message": f"Node {new_node} registered.",
-                        "election_start_time": blockchain.election_start_time
-                    }
-                except ValueError as e:
-                    response = {"status": "Error", "message": str(e)}
-            else:
-                response = {"status": "Error", "message": "No node provided."}
+    Handlers may return such frames (bytes) instead of a response dict.
+    """
+    cached = blockchain.reply_cache.get(name)
+    if cached is None or cached[0] != version:
+        cached = (version, encode_frame(build()))
+        blockchain.reply_cache[name] = cached
+    return cached[1]
 
-        elif msg_type == "ELECT_LEADER":
-            leader = message.get("leader")
-            if leader is not None:
-                blockchain.current_leader = leader
-                response = {"status": "OK", "message": f"Leader set to {leader}"}
-            else:
-                response = {"status": "Error", "message": "No leader provided."}
-
-        elif msg_type == "NEW_TRANSACTION":
-            transaction = message.get("transaction")
-            if transaction:
-                # Use the provided transaction directly
-                blockchain.new_transaction(None, None, None, auto_broadcast=False, transaction=transaction)
-                response = {"status": "OK", "message": "Transaction will be added."}
-            else:
-                sender = message.get("sender")
-                recipient = message.get("recipient")
-                amount = message.get("amount")
-                if sender and recipient and amount is not None:
-                    blockchain.new_transaction(sender, recipient, amount, auto_broadcast=False)
-                    response = {"status": "OK", "message": "Transaction will be added."}
-                else:
-                    response = {"status": "Error", "message": "Missing transaction fields."}
-
-
-
-        elif msg_type == "NEW_BLOCK":
-            # For backward compatibility, you can keep this handler if needed.
-            block = message.get("block")
-            if block:
-                last_block = blockchain.last_block
-                if block.get("index") == last_block["index"] + 1:
-                    if block.get("previous_hash") == blockchain.hash(last_block):
-                        blockchain.chain.append(block)
-                        block_tx_set = set(canonical_transaction(tx) for tx in block.get("transactions", []))
-                        blockchain.current_transactions = [
-                            tx for tx in blockchain.current_transactions 
-                            if canonical_transaction(tx) not in block_tx_set
-                        ]
-                        block_hash = blockchain.hash(block)
-                        if block_hash not in blockchain.seen_blocks:
-                            blockchain.seen_blocks.add(block_hash)
-                        response = {"status": "OK", "message": "Block accepted and transactions synced."}
-                    else:
-                        blockchain.resolve_conflicts()
-                        response = {"status": "OK", "message": "Chain synchronized with peers."}
-                elif block.get("index") > last_block["index"] + 1:
-                    blockchain.resolve_conflicts()
-                    response = {"status": "OK", "message": "Chain synchronized with peers."}
-                else:
-                    response = {"status": "Error", "message": "Invalid block."}
-            else:
-                response = {"status": "Error", "message": "No block provided."}
-
-        elif msg_type == "GET_NODES":
-            response = {"type": "NODES", "nodes": list(blockchain.nodes)}
-
-        elif msg_type == "GET_PENDING":
-            response = {"type": "PENDING", "pending": blockchain.current_transactions}
-
-        elif msg_type == "DISCOVER_PEERS":
-            response = {"type": "PEERS", "nodes": list(blockchain.nodes)}
-
-        elif msg_type == "BLOCK_PROPOSE":
-            block = message.get("block")
-            if block:
-                last_block = blockchain.last_block
-                # Validate that the block is the immediate next block
-                if (block.get("index") == last_block["index"] + 1 and
-                    block.get("previous_hash") == blockchain.hash(last_block) and
-                    blockchain.valid_proof(last_block['nonce'], block.get("nonce"), blockchain.hash(last_block),
-                                             block.get("difficulty", blockchain.difficulty))):
-                    response = {"vote": "approve"}
-                else:
-                    response = {"vote": "reject"}
-            else:
-                response = {"vote": "reject", "message": "No block provided."}
-
-        elif msg_type == "BLOCK_COMMIT":
-            block = message.get("block")
-            if block:
-                last_block = blockchain.last_block
-                if (block.get("index") == last_block["index"] + 1 and
-                    block.get("previous_hash") == blockchain.hash(last_block)):
-                    blockchain.chain.append(block)
-                    block_tx_set = set(canonical_transaction(tx) for tx in block.get("transactions", []))
-                    blockchain.current_transactions = [
-                        tx for tx in blockchain.current_transactions
-                        if canonical_transaction(tx) not in block_tx_set
-                    ]
-                    block_hash = blockchain.hash(block)
-                    if block_hash not in blockchain.seen_blocks:
-                        blockchain.seen_blocks.add(block_hash)
-                    response = {"status": "committed"}
-                else:
-                    response = {"status": "error", "message": "Block rejected during commit."}
+def _handle_get_chain(message, blockchain):
+    # Read the version before the chain so a concurrent change re-encodes.
+    version = blockchain.version
+    chain = blockchain.chain
+    return _cached_frame(blockchain, "CHAIN", version,
+                         lambda: {"type": "CHAIN", "chain": chain})
+
+def _handle_get_chain_since(message, blockchain):
+    # Blocks are numbered from 1, so the blocks after index n start at chain[n].
+    index = message.get("index")
+    if isinstance(index, int) and index >= 0:
+        response = {"type": "CHAIN_DELTA", "blocks": blockchain.chain[index:]}
+    else:
+        response = {"status": "Error", "message": "No valid index provided."}
+    return response
+
+def _handle_register_node(message, blockchain):
+    new_node = message.get("node")
+    if new_node:
+        try:
+            blockchain.register_node(new_node)
+            response = {
+                "status": "OK",
+                "message": f"Node {new_node} registered.",
+                "election_start_time": blockchain.election_start_time
+            }
+        except ValueError as e:
+            response = {"status": "Error", "message": str(e)}
+    else:
+        response = {"status": "Error", "message": "No node provided."}
+    return response
+
+def _handle_elect_leader(message, blockchain):
+    leader = message.get("leader")
+    if leader is not None:
+        blockchain.current_leader = leader
+        response = {"status": "OK", "message": f"Leader set to {leader}"}
+    else:
+        response = {"status": "Error", "message": "No leader provided."}
+    return response
+
+def _handle_new_transaction(message, blockchain):
+    transaction = message.get("transaction")
+    if transaction:
+        # Gossip delivers the same transaction from several peers; answer
+        # repeats before touching the pool.
+        if blockchain.known_transaction(transaction):
+            return {"status": "OK", "message": "Duplicate transaction ignored."}
+        # Use the provided transaction directly
+        blockchain.new_transaction(None, None, None, auto_broadcast=False, transaction=transaction)
+        response = {"status": "OK", "message": "Transaction will be added."}
+    else:
+        sender = message.get("sender")
+        recipient = message.get("recipient")
+        amount = message.get("amount")
+        if sender and recipient and amount is not None:
+            blockchain.new_transaction(sender, recipient, amount, auto_broadcast=False)
+            response = {"status": "OK", "message": "Transaction will be added."}
+        else:
+            response = {"status": "Error", "message": "Missing transaction fields."}
+    return response
+
+def _handle_new_block(message, blockchain):
+    # For backward compatibility, you can keep this handler if needed.
+    block = message.get("block")
+    if block:
+        last_block = blockchain.last_block
+        if block.get("index") == last_block["index"] + 1:
+            if block.get("previous_hash") == blockchain.last_block_hash:
+                blockchain.add_block(block)
+                response = {"status": "OK", "message": "Block accepted and transactions synced."}
             else:
-                response = {"status": "error", "message": "No block provided."}
+                # Fork at our tip: let the sync thread pick the heavier chain.
+                blockchain.sync_needed.set()
+                response = {"status": "OK", "message": "Chain sync scheduled."}
+        elif block.get("index") > last_block["index"] + 1:
+            # We are behind; wake periodic_sync instead of resolving inline.
+            blockchain.sync_needed.set()
+            response = {"status": "OK", "message": "Chain sync scheduled."}
+        elif blockchain.hash(block) in blockchain.seen_blocks:
+            # Gossip delivers the same block from several peers.
+            response = {"status": "OK", "message": "Duplicate block ignored."}
+        else:
+            response = {"status": "Error", "message": "Invalid block."}
+    else:
+        response = {"status": "Error", "message": "No block provided."}
+    return response
+
+def _handle_get_head(message, blockchain):
+    return {
+        "type": "HEAD",
+        "length": len(blockchain.chain),
+        "hash": blockchain.last_block_hash,
+        "work": blockchain.cumulative_work(),
+        "nodes": len(blockchain.nodes)
+    }
+
+def _handle_get_nodes(message, blockchain):
+    nodes = blockchain.nodes
+    return _cached_frame(blockchain, "NODES", nodes.version,
+                         lambda: {"type": "NODES", "nodes": list(nodes.snapshot())})
 
+def _handle_get_pending(message, blockchain):
+    since = message.get("since")
+    # Read the sequence number first so nothing added meanwhile is skipped.
+    seq = blockchain.pending_seq
+    if since is None:
+        version = blockchain.version
+        pending = blockchain.current_transactions
+        return _cached_frame(blockchain, "PENDING", version,
+                             lambda: {"type": "PENDING", "pending": pending, "seq": seq})
+    return {"type": "PENDING", "pending": blockchain.pending_since(since), "seq": seq}
+
+def _handle_discover_peers(message, blockchain):
+    nodes = blockchain.nodes
+    return _cached_frame(blockchain, "PEERS", nodes.version,
+                         lambda: {"type": "PEERS", "nodes": list(nodes.snapshot())})
+
+def _handle_block_propose(message, blockchain):
+    block = message.get("block")
+    if block:
+        last_block = blockchain.last_block
+        last_hash = blockchain.last_block_hash
+        # Validate that the block is the immediate next block; the cheap
+        # index and hash comparisons run before the proof-of-work check.
+        if (block.get("index") == last_block["index"] + 1 and
+            block.get("previous_hash") == last_hash and
+            blockchain.valid_proof(last_block['nonce'], block.get("nonce"), last_hash,
+                                     block.get("difficulty", blockchain.difficulty))):
+            response = {"vote": "approve"}
         else:
-            response = {"status": "Error", "message": "Unknown message type."}
+            if block.get("index", 0) > last_block["index"] + 1:
+                # We missed blocks; catch up so later proposals can be approved.
+                blockchain.sync_needed.set()
+            response = {"vote": "reject"}
+    else:
+        response = {"vote": "reject", "message": "No block provided."}
+    return response
 
-        file.write((json.dumps(response) + "\n").encode("utf-8"))
-        file.flush()
-    except Exception as e:
-        logging.error(f"Error handling connection from {addr}: {e}")
-    finally:
-        conn.close()
+def _handle_block_commit(message, blockchain):
+    block = message.get("block")
+    if block:
+        last_block = blockchain.last_block
+        if (block.get("index") == last_block["index"] + 1 and
+            block.get("previous_hash") == blockchain.last_block_hash):
+            blockchain.add_block(block)
+            response = {"status": "committed"}
+        elif blockchain.hash(block) in blockchain.seen_blocks:
+            # Already committed, e.g. the block reached us through a sync first.
+            response = {"status": "committed"}
+        else:
+            # The leader's chain no longer extends ours; wake periodic_sync.
+            blockchain.sync_needed.set()
+            response = {"status": "error", "message": "Block rejected during commit."}
+    else:
+        response = {"status": "error", "message": "No block provided."}
+    return response
+
+def _handle_unknown(message, blockchain):
+    return {"status": "Error", "message": "Unknown message type."}
+
+HANDLERS = {
+    "PING": _handle_ping,
+    "GET_CHAIN": _handle_get_chain,
+    "GET_CHAIN_SINCE": _handle_get_chain_since,
+    "REGISTER_NODE": _handle_register_node,
+    "ELECT_LEADER": _handle_elect_leader,
+    "NEW_TRANSACTION": _handle_new_transaction,
+    "NEW_BLOCK": _handle_new_block,
+    "GET_HEAD": _handle_get_head,
+    "GET_NODES": _handle_get_nodes,
+    "GET_PENDING": _handle_get_pending,
+    "DISCOVER_PEERS": _handle_discover_peers,
+    "BLOCK_PROPOSE": _handle_block_propose,
+    "BLOCK_COMMIT": _handle_block_commit,
+}
+
+def process_message(message, blockchain):
+    """Handle one decoded peer message and return the response to send back."""
+    handler = HANDLERS.get(message.get("type"), _handle_unknown)
+    return handler(message, blockchain)
+
+class PeerConnection:
+    """State of one accepted peer connection in the server's selector loop."""
+
+    def __init__(self, sock, addr):
+        self.sock = sock
+        self.addr = addr
+        self.inbuf = bytearray()
+        self.outbuf = bytearray()
+        self.busy = False  # a message from this connection is being handled
+        self.closed = False
+
+def _next_frame(buf):
+    """Remove and return the body of the first complete frame in buf, or None."""
+    if len(buf) < _HEADER.size:
+        return None
+    (length,) = _HEADER.unpack_from(buf)
+    if length > MAX_FRAME_BYTES:
+        raise ValueError(f"frame of {length} bytes exceeds MAX_FRAME_BYTES")
+    end = _HEADER.size + length
+    if len(buf) < end:
+        return None
+    body = bytes(buf[_HEADER.size:end])
+    del buf[:end]
+    return body
 
 def run_server(host, port, blockchain, node_identifier):
+    """Serve peers from one selector loop.
+
+    All socket I/O happens on this thread. Frames are decoded and handled
+    on _handler_pool so that parsing, proof checks and encoding large
+    chain replies do not stall every other connection; finished replies
+    come back through a queue and a socketpair that wakes the loop.
+    Messages on one connection are handled one at a time so replies keep
+    their order.
+    """
     server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    # Set before listen() so accepted sockets start with the larger window.
+    _set_buffers(server)
     server.bind((host, port))
-    server.listen(5)
+    server.listen(128)
+    server.setblocking(False)
     if debug:
         logging.info(f"Node {node_identifier} listening on {host}:{port}")
+
+    sel = selectors.DefaultSelector()
+    sel.register(server, selectors.EVENT_READ)
+    wake_r, wake_w = socket.socketpair()
+    wake_r.setblocking(False)
+    sel.register(wake_r, selectors.EVENT_READ)
+    replies = queue.SimpleQueue()
+    slots = threading.BoundedSemaphore(MAX_QUEUED_MESSAGES)
+
+    def close(conn):
+        conn.closed = True
+        sel.unregister(conn.sock)
+        conn.sock.close()
+
+    def handle(conn, body):
+        try:
+            response = process_message(loads(body), blockchain)
+            reply = response if isinstance(response, bytes) else encode_frame(response)
+        except Exception as e:
+            logging.error(f"Error handling connection from {conn.addr}: {e}")
+            reply = None
+        slots.release()
+        replies.put((conn, reply))
+        wake_w.send(b"\0")
+
+    def dispatch(conn):
+        if conn.busy:
+            return
+        try:
+            body = _next_frame(conn.inbuf)
+        except ValueError as e:
+            logging.warning(f"Closing connection from {conn.addr}: {e}")
+            close(conn)
+            return
+        if body is not None:
+            conn.busy = True
+            if slots.acquire(blocking=False):
+                _handler_pool.submit(handle, conn, body)
+            else:
+                # Saturated: shed the message rather than queue it.
+                logging.warning(f"Too many queued messages; rejecting one from {conn.addr}")
+                replies.put((conn, BUSY_FRAME))
+                wake_w.send(b"\0")
+
     while True:
-        conn, addr = server.accept()
-        if debug:
-            logging.info(f"Accepted connection from {addr}")
-        threading.Thread(
-            target=handle_client_connection,
-            args=(conn, addr, blockchain, node_identifier),
-            daemon=True
-        ).start()
-
-def broadcast_message(blockchain, message):
-    for node in list(blockchain.nodes):
-        send_message(node, message)
+        for key, events in sel.select():
+            sock = key.fileobj
+            if sock is server:
+                try:
+                    client, addr = server.accept()
+                except BlockingIOError:
+                    continue
+                if debug:
+                    logging.info(f"Accepted connection from {addr}")
+                client.setblocking(False)
+                _tune_socket(client)
+                sel.register(client, selectors.EVENT_READ, PeerConnection(client, addr))
+
+            elif sock is wake_r:
+                try:
+                    wake_r.recv(4096)
+                except BlockingIOError:
+                    pass
+                while True:
+                    try:
+                        conn, reply = replies.get_nowait()
+                    except queue.Empty:
+                        break
+                    if conn.closed:
+                        continue
+                    if reply is None:
+                        close(conn)
+                        continue
+                    conn.busy = False
+                    if not conn.outbuf:
+                        # Write straight from the reply (often a cached frame)
+                        # and only buffer what the kernel did not take.
+                        try:
+                            sent = conn.sock.send(reply)
+                        except BlockingIOError:
+                            sent = 0
+                        except OSError:
+                            close(conn)
+                            continue
+                        reply = memoryview(reply)[sent:]
+                    if reply:
+                        conn.outbuf += reply
+                        sel.modify(conn.sock, selectors.EVENT_READ | selectors.EVENT_WRITE, conn)
+                    dispatch(conn)
+
+            else:
+                conn = key.data
+                if events & selectors.EVENT_READ:
+                    try:
+                        chunk = sock.recv(65536)
+                    except BlockingIOError:
+                        chunk = None
+                    except OSError:
+                        chunk = b""
+                    if chunk == b"":
+                        close(conn)
+                        continue
+                    if chunk:
+                        conn.inbuf += chunk
+                        dispatch(conn)
+                        if conn.closed:
+                            continue
+                if events & selectors.EVENT_WRITE and conn.outbuf:
+                    try:
+                        sent = sock.send(conn.outbuf)
+                    except BlockingIOError:
+                        sent = 0
+                    except OSError:
+                        close(conn)
+                        continue
+                    del conn.outbuf[:sent]
+                    if not conn.outbuf:
+                        sel.modify(sock, selectors.EVENT_READ, conn)
+
+def query_peers(peers, message):
+    """Send message to all peers concurrently and return {peer: response}."""
+    peers = list(peers)
+    responses = _request_pool.map(lambda peer: send_message(peer, message, expect_response=True), peers)
+    return dict(zip(peers, responses))
+
+def broadcast_message(blockchain, message, block=True):
+    """Send message to every peer in parallel.
+
+    Waits at most BROADCAST_WAIT seconds so one slow or dead peer cannot
+    hold up the caller; unfinished sends complete in the background. With
+    block=False it returns as soon as the sends are queued.
+    """
+    frame = encode_frame(message)  # serialize once, not once per peer
+    now = monotonic()
+    # Peers that failed recently are skipped until their backoff expires, so a
+    # dead peer does not cost a connect timeout on every broadcast.
+    futures = [_request_pool.submit(send_raw, node, frame) for node in blockchain.nodes.snapshot()
+               if _backoff.get(node, (0, 0))[1] <= now]
+    if futures and block:
+        wait(futures, timeout=BROADCAST_WAIT)
 
 def broadcast_election(blockchain):
     """
     Broadcast the current leader (after election) to all peers.
     """
     leader = blockchain.elect_leader()
-    for node in list(blockchain.nodes):
-        send_message(node, {"type": "ELECT_LEADER", "leader": leader})
+    broadcast_message(blockchain, {"type": "ELECT_LEADER", "leader": leader})